@@ -7,6 +7,40 @@ import time
 import struct
 from w5500_driver import W5500
 
+# Modbus TCP frame layouts (MicroPython's struct has no Struct class to
+# precompile these, so they are shared as module-level format constants)
+_MBAP = '>HHHB'          # Transaction ID, protocol ID, length, unit ID
+_U16 = '>H'              # 16-bit register / pointer value
+_U16X2 = '>HH'           # Two adjacent 16-bit registers (e.g. Sn_RX_RSR + Sn_RX_RD)
+_HDR8 = '>HHHBB'         # MBAP header + function code
+_FIXED_REQ = '>HHHBBHH'  # MBAP header + function code, address, count (or value)
+_PDU_WR_MULTI = '>BHHB'  # Function code, address, count, byte count
+
+
+def _poll_delay(elapsed_ms):
+    """Adaptive poll interval: spin while a reply is likely, then back off"""
+    if elapsed_ms < 2:
+        return 0
+    elif elapsed_ms < 20:
+        return 1
+    elif elapsed_ms < 100:
+        return 5
+    return 20
+
+def _tcp_timeout_ms(rtr, rcr):
+    """
+    Time until the W5500 stops retransmitting and raises Sn_IR TIMEOUT
+    
+    Datasheet formula: the retry time (rtr, in 100us units) doubles on each
+    retransmission until it would exceed 0xFFFF, then stays at that value
+    for the remaining retries.
+    """
+    m = 0
+    while m < rcr and (rtr << (m + 1)) <= 0xFFFF:
+        m += 1
+    rtr_max = rtr << m
+    return (rtr * ((1 << (m + 1)) - 1) + (rcr - m) * rtr_max) // 10
+
 class SiemensModbusTCP:
     """
     Modbus TCP client optimized for Siemens S7-1500 PLCs
@@ -14,7 +48,8 @@ class SiemensModbusTCP:
     """
     
     def __init__(self, w5500, local_ip="192.168.123.29", subnet="255.255.255.0", 
-                 gateway="192.168.123.1", mac_addr="02:08:DC:AB:CD:29"):
+                 gateway="192.168.123.1", mac_addr="02:08:DC:AB:CD:29",
+                 low_latency=False, delayed_ack=False):
         """
         Initialize Siemens Modbus TCP client
         
@@ -24,19 +59,40 @@ class SiemensModbusTCP:
             subnet: Subnet mask
             gateway: Gateway IP address  
             mac_addr: MAC address for the W5500
+            low_latency: Use a 100ms retry time and cap response polling
+                         at 1ms (for PLCs on a fast, quiet machine network)
+            delayed_ack: Let the W5500 delay ACKs (clears the Sn_MR ND bit);
+                         by default ACKs go out immediately
         """
         self.w5500 = w5500
         self.local_ip = local_ip
         self.subnet = subnet
         self.gateway = gateway
         self.mac_addr = mac_addr
+        self.low_latency = low_latency
+        self.delayed_ack = delayed_ack
         
         # Connection settings
         self.plc_ip = "192.168.123.10"  # Default S7-1500 address
         self.plc_port = 502  # Standard Modbus TCP port
+        self._plc_ip_bytes = bytes(map(int, self.plc_ip.split('.')))  # Parsed once for Sn_DIPR
+        self._plc_port_bytes = struct.pack(_U16, self.plc_port)      # Parsed once for Sn_DPORT
         self.socket = 0  # Use socket 0 for Modbus
         self.connected = False
         self.transaction_id = 1
+        self._arp_verified = False  # Set after the first successful ARP probe
+        
+        # Pipelining state
+        self._pending = {}        # Transaction ID -> callback (or None) for in-flight requests
+        self._completed = {}      # Transaction ID -> response ADU awaiting wait_for()
+        self._rx_scratch = bytearray(300)  # Received bytes not yet split into ADUs
+        self._rx_mv = memoryview(self._rx_scratch)
+        self._rx_off = 0  # Start of unconsumed data in _rx_scratch
+        self._rx_len = 0  # End of received data in _rx_scratch
+        self._tx_frame = bytearray(260)  # MBAP (7) + max PDU (253), reused for every request
+        self._tx_wr = 0  # Local copy of Sn_TX_WR, seeded on connect
+        self._sr_cached = None  # Last Sn_SR read by is_connected() (None = stale)
+        self._sr_ts = 0
         
         # Configure network
         self._setup_network()
@@ -51,40 +107,48 @@ class SiemensModbusTCP:
         # Configure network parameters
         self.w5500.set_mac_address(self.mac_addr)
         self.w5500.set_ip_address(self.local_ip)
-        self.w5500.set_subnet_mask(self.subnet)
-        self.w5500.set_gateway(self.gateway)
+        self.w5500.set_gateway_and_mask(self.gateway, self.subnet)
         
         # Set optimized retry parameters for industrial networks
-        # RTR = 500ms (industrial networks can be slower)
-        self.w5500._write_reg(0x0019, 0x00, [0x13, 0x88])  # RTR = 5000 (500ms)
+        if self.low_latency:
+            # RTR = 100ms (fast retransmit on a quiet machine network)
+            rtr = 1000
+        else:
+            # RTR = 500ms (industrial networks can be slower)
+            rtr = 5000
+        self.w5500._write_reg(0x0019, 0x00, struct.pack(_U16, rtr))
         
         # RCR = 10 retries (more persistent for industrial use)
-        self.w5500._write_reg(0x001B, 0x00, 0x0A)  # RCR = 10
+        rcr = 10
+        self.w5500._write_reg_u8(0x001B, 0x00, rcr)
+        
+        # SEND_OK wait budget: the chip's own retransmit give-up time, plus
+        # margin, so a retransmitted segment is never mistaken for a failure
+        self._send_timeout_ms = _tcp_timeout_ms(rtr, rcr) + 1000
         
         print(f"Network configured: {self.local_ip} -> PLC {self.plc_ip}")
         
     def _apply_arp_fix(self):
         """Apply the ARP fix we discovered earlier"""
-        # Force close all sockets
-        for sock in range(8):
-            try:
-                socket_bsb = 0x01 + (sock * 4)
-                self.w5500._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE
-            except:
-                pass
-        
-        # Software reset
-        self.w5500._write_reg(0x0000, 0x00, 0x80)  # Set RST bit
+        # Software reset (also closes all sockets)
+        self.w5500._write_reg_u8(0x0000, 0x00, 0x80)  # Set RST bit
         time.sleep_ms(50)
+        self._arp_verified = False  # Reset wiped the chip's ARP cache
         
         # Enable Force ARP mode for reliable connectivity
-        mr = self.w5500._read_reg(0x0000, 0x00, 1)[0]
-        self.w5500._write_reg(0x0000, 0x00, mr | 0x02)  # Set FARP bit
+        mr = self.w5500._read_reg_u8(0x0000, 0x00)
+        self.w5500._write_reg_u8(0x0000, 0x00, mr | 0x02)  # Set FARP bit
         
     def set_plc_address(self, ip_address):
         """Change the PLC IP address"""
         self.plc_ip = ip_address
+        self._plc_ip_bytes = bytes(map(int, self.plc_ip.split('.')))
+        self._arp_verified = False
         print(f"PLC address changed to: {self.plc_ip}")
+    
+    def force_arp_check(self):
+        """Re-run the ARP probe on the next connect()"""
+        self._arp_verified = False
         
     def connect(self, timeout_ms=10000):
         """
@@ -96,6 +160,15 @@ class SiemensModbusTCP:
         Returns:
             bool: True if connected successfully
         """
+        # Bind hot-loop lookups to locals
+        _wr = self.w5500._write_reg
+        _rd = self.w5500._read_reg_view  # Results are unpacked right away
+        _wr8 = self.w5500._write_reg_u8
+        _rd8 = self.w5500._read_reg_u8
+        _now = time.ticks_ms
+        _diff = time.ticks_diff
+        _sleep = time.sleep_ms
+        
         if self.connected:
             print("Already connected to PLC")
             return True
@@ -110,61 +183,73 @@ class SiemensModbusTCP:
             if not self._wait_for_link():
                 raise Exception("PHY link not available")
             
-            # Test ARP resolution first
-            if not self._test_arp_resolution():
-                raise Exception("ARP resolution failed")
+            # Test ARP resolution first (once - the W5500 caches the PLC's MAC
+            # and FARP mode re-resolves it on every send anyway)
+            if not self._arp_verified:
+                if not self._test_arp_resolution():
+                    raise Exception("ARP resolution failed")
+                self._arp_verified = True
             
             # Open TCP socket
             socket_bsb = 0x01  # Socket 0
             
-            # Set TCP mode and local port
-            self.w5500._write_reg(0x0000, socket_bsb, 0x01)  # TCP mode
-            self.w5500._write_reg(0x0004, socket_bsb, [0xC3, 0x50])  # Port 50000
-            self.w5500._write_reg(0x0001, socket_bsb, 0x01)  # OPEN command
+            # Set TCP mode and local port. The W5500 has no Nagle-style
+            # coalescing (each SEND is one segment); ND (No Delayed ACK) makes
+            # it ACK PLC data immediately instead of waiting for more traffic
+            if self.delayed_ack:
+                _wr8(0x0000, socket_bsb, 0x01)  # TCP mode
+            else:
+                _wr8(0x0000, socket_bsb, 0x01 | 0x20)  # TCP mode + ND
+            _wr(0x0004, socket_bsb, [0xC3, 0x50])  # Port 50000
+            _wr8(0x0001, socket_bsb, 0x01)  # OPEN command
             
             # Wait for socket to open
-            for i in range(50):
-                if self.w5500._read_reg(0x0001, socket_bsb, 1)[0] == 0x00:
+            for _ in range(200):  # Sn_CR clears within microseconds
+                if _rd8(0x0001, socket_bsb) == 0x00:
                     break
-                time.sleep_ms(10)
+                time.sleep_us(50)
             
-            status = self.w5500._read_reg(0x0003, socket_bsb, 1)[0]
+            status = _rd8(0x0003, socket_bsb)
             if status != 0x13:  # SOCK_INIT
                 raise Exception(f"Socket open failed: 0x{status:02x}")
             
             # Set destination (PLC)
-            dest_bytes = [int(x) for x in self.plc_ip.split('.')]
-            self.w5500._write_reg(0x000C, socket_bsb, dest_bytes)  # Destination IP
-            self.w5500._write_reg(0x0010, socket_bsb, [self.plc_port >> 8, self.plc_port & 0xFF])  # Dest port
+            dest_bytes = self._plc_ip_bytes
+            _wr(0x000C, socket_bsb, dest_bytes)  # Destination IP
+            _wr(0x0010, socket_bsb, self._plc_port_bytes)  # Dest port
             
             # Clear interrupts
-            self.w5500._write_reg(0x0002, socket_bsb, 0xFF)
+            _wr8(0x0002, socket_bsb, 0xFF)
             
             # Connect
-            self.w5500._write_reg(0x0001, socket_bsb, 0x04)  # CONNECT command
+            _wr8(0x0001, socket_bsb, 0x04)  # CONNECT command
             
             # Wait for connection with timeout
-            start_time = time.ticks_ms()
-            while time.ticks_diff(time.ticks_ms(), start_time) < timeout_ms:
-                status = self.w5500._read_reg(0x0003, socket_bsb, 1)[0]
-                sir = self.w5500._read_reg(0x0002, socket_bsb, 1)[0]
+            start_time = _now()
+            while _diff(_now(), start_time) < timeout_ms:
+                # Sn_IR and Sn_SR are adjacent - fetch both in one read
+                sir, status = _rd(0x0002, socket_bsb, 2)
                 
                 if status == 0x17:  # SOCK_ESTABLISHED
+                    # Seed the local copy of the TX write pointer
+                    tx_wr_bytes = _rd(0x0024, socket_bsb, 2)
+                    self._tx_wr = struct.unpack_from(_U16, tx_wr_bytes)[0]
                     self.connected = True
                     print("Connected to Siemens PLC successfully")
                     return True
                 elif sir & 0x08:  # TIMEOUT
-                    self.w5500._write_reg(0x0002, socket_bsb, 0x08)  # Clear timeout
+                    _wr8(0x0002, socket_bsb, 0x08)  # Clear timeout
                     raise Exception("Connection timeout")
                 elif status == 0x00:  # SOCK_CLOSED
                     raise Exception("Connection refused by PLC")
                     
-                time.sleep_ms(100)
+                _sleep(100)
             
             raise Exception("Connection timeout")
             
         except Exception as e:
             print(f"Connection failed: {e}")
+            self._arp_verified = False  # Probe again on the next attempt
             self._close_socket()
             return False
     
@@ -180,10 +265,23 @@ class SiemensModbusTCP:
         """Close the Modbus socket"""
         try:
             socket_bsb = 0x01  # Socket 0
-            self.w5500._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE command
-            time.sleep_ms(20)
-        except:
-            pass
+            self.w5500._write_reg_u8(0x0001, socket_bsb, 0x10)  # CLOSE command
+            
+            # Wait for SOCK_CLOSED
+            for _ in range(200):
+                if self.w5500._read_reg_u8(0x0003, socket_bsb) == 0x00:
+                    break
+                time.sleep_us(50)
+        except OSError as e:
+            print(f"Socket close failed: {e}")
+        
+        # Responses still in flight belong to the old connection
+        self._tx_wr = 0
+        self._sr_cached = None
+        self._pending = {}
+        self._completed = {}
+        self._rx_off = 0
+        self._rx_len = 0
     
     def _wait_for_link(self, timeout_ms=5000):
         """Wait for PHY link to be established"""
@@ -197,144 +295,395 @@ class SiemensModbusTCP:
     
     def _test_arp_resolution(self):
         """Test ARP resolution using UDP"""
+        # Bind hot-loop lookups to locals
+        _wr = self.w5500._write_reg
+        _wr8 = self.w5500._write_reg_u8
+        _rd8 = self.w5500._read_reg_u8
+        _now = time.ticks_ms
+        _diff = time.ticks_diff
+        _sleep = time.sleep_ms
+        
         try:
             # Use socket 1 for ARP test
             socket_bsb = 0x05  # Socket 1
             
             # Close and open UDP socket
-            self.w5500._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE
-            time.sleep_ms(10)
+            _wr8(0x0001, socket_bsb, 0x10)  # CLOSE
+            _sleep(10)
             
-            self.w5500._write_reg(0x0000, socket_bsb, 0x02)  # UDP mode
-            self.w5500._write_reg(0x0004, socket_bsb, [0xC3, 0x51])  # Port 50001
-            self.w5500._write_reg(0x0001, socket_bsb, 0x01)  # OPEN
+            _wr8(0x0000, socket_bsb, 0x02)  # UDP mode
+            _wr(0x0004, socket_bsb, [0xC3, 0x51])  # Port 50001
+            _wr8(0x0001, socket_bsb, 0x01)  # OPEN
             
             # Wait for open
-            for i in range(50):
-                if self.w5500._read_reg(0x0001, socket_bsb, 1)[0] == 0x00:
+            for _ in range(200):  # Sn_CR clears within microseconds
+                if _rd8(0x0001, socket_bsb) == 0x00:
                     break
-                time.sleep_ms(10)
+                time.sleep_us(50)
             
             # Set destination
-            dest_bytes = [int(x) for x in self.plc_ip.split('.')]
-            self.w5500._write_reg(0x000C, socket_bsb, dest_bytes)
-            self.w5500._write_reg(0x0010, socket_bsb, [0x01, 0xF6])  # Port 502
+            dest_bytes = self._plc_ip_bytes
+            _wr(0x000C, socket_bsb, dest_bytes)
+            _wr(0x0010, socket_bsb, self._plc_port_bytes)
             
             # Send dummy data
             tx_buf_bsb = 0x06  # Socket 1 TX buffer
-            self.w5500._write_reg(0x0000, tx_buf_bsb, [0x00, 0x01])  # 2 bytes
-            self.w5500._write_reg(0x0024, socket_bsb, [0x00, 0x02])  # TX_WR = 2
-            self.w5500._write_reg(0x0001, socket_bsb, 0x20)  # SEND
+            _wr(0x0000, tx_buf_bsb, [0x00, 0x01])  # 2 bytes
+            _wr(0x0024, socket_bsb, [0x00, 0x02])  # TX_WR = 2
+            _wr8(0x0001, socket_bsb, 0x20)  # SEND
             
             # Wait for send completion
-            for i in range(50):
-                cmd = self.w5500._read_reg(0x0001, socket_bsb, 1)[0]
-                sir = self.w5500._read_reg(0x0002, socket_bsb, 1)[0]
+            start_time = _now()
+            while True:
+                cmd = _rd8(0x0001, socket_bsb)
+                sir = _rd8(0x0002, socket_bsb)
                 
                 if cmd == 0x00:  # Command done
                     if sir & 0x10:  # SEND_OK
-                        self.w5500._write_reg(0x0001, socket_bsb, 0x10)  # Close UDP socket
+                        _wr8(0x0001, socket_bsb, 0x10)  # Close UDP socket
                         return True
                     elif sir & 0x08:  # TIMEOUT
                         break
-                        
-                time.sleep_ms(50)
+                
+                elapsed = _diff(_now(), start_time)
+                if elapsed >= 2500:
+                    break
+                _sleep(_poll_delay(elapsed))
             
-            self.w5500._write_reg(0x0001, socket_bsb, 0x10)  # Close UDP socket
+            _wr8(0x0001, socket_bsb, 0x10)  # Close UDP socket
             return False
             
-        except:
+        except (OSError, ValueError):
             return False
     
     def _send_modbus_frame(self, pdu):
-        """Send Modbus TCP frame"""
+        """
+        Send Modbus TCP frame
+        
+        Returns:
+            int: Transaction ID used for the frame
+        """
         if not self.connected:
             raise Exception("Not connected to PLC")
         
-        # Build MBAP header
-        mbap = struct.pack('>HHHB', 
-                          self.transaction_id,  # Transaction ID
-                          0,                    # Protocol ID (always 0 for Modbus TCP)
-                          len(pdu) + 1,        # Length (PDU + Unit ID)
-                          1)                    # Unit ID (typically 1 for PLCs)
+        if len(pdu) > 253:  # Modbus TCP ADU limit (260) minus MBAP header
+            raise ValueError("Maximum PDU length is 253 bytes")
+        
+        tid = self.transaction_id
+        
+        # Build MBAP header + PDU in the preallocated frame buffer
+        frame_len = 7 + len(pdu)
+        struct.pack_into(_MBAP, self._tx_frame, 0,
+                         tid,                  # Transaction ID
+                         0,                    # Protocol ID (always 0 for Modbus TCP)
+                         len(pdu) + 1,         # Length (PDU + Unit ID)
+                         1)                    # Unit ID (typically 1 for PLCs)
+        self._tx_frame[7:frame_len] = pdu
+        
+        self._send_frame_raw(memoryview(self._tx_frame)[:frame_len])
+        return tid
+    
+    def _send_request(self, func_code, address, value):
+        """
+        Send a fixed-size request (function codes 3, 4 and 6)
+        
+        The MBAP header and the 5-byte PDU are packed into the frame buffer
+        with a single pack_into call.
+        
+        Returns:
+            int: Transaction ID used for the frame
+        """
+        if not self.connected:
+            raise Exception("Not connected to PLC")
         
-        frame = mbap + pdu
+        tid = self.transaction_id
+        struct.pack_into(_FIXED_REQ, self._tx_frame, 0,
+                         tid, 0, 6, 1,         # MBAP: TID, protocol, length, unit ID
+                         func_code, address, value)
+        
+        self._send_frame_raw(memoryview(self._tx_frame)[:12])
+        return tid
+    
+    def _send_frame_raw(self, frame):
+        """
+        Send an already-built Modbus TCP frame
+        
+        Waits for SEND_OK before returning so each ADU leaves in its own
+        TCP segment, even when several requests are pipelined.
+        """
+        # Bind hot-loop lookups to locals
+        _wr = self.w5500._write_reg
+        _wr8 = self.w5500._write_reg_u8
+        _rd8 = self.w5500._read_reg_u8
+        _now = time.ticks_ms
+        _diff = time.ticks_diff
+        _sleep = time.sleep_ms
         
         # Send via W5500
         socket_bsb = 0x01  # Socket 0
-        tx_buf_bsb = 0x02  # Socket 0 TX buffer
         
-        # Get current TX write pointer
-        tx_wr_bytes = self.w5500._read_reg(0x0024, socket_bsb, 2)
-        tx_wr = struct.unpack('>H', tx_wr_bytes)[0]
+        # TX write pointer is tracked locally (only this client advances it)
+        tx_wr = self._tx_wr
         
         # Write frame to TX buffer
-        for i, byte in enumerate(frame):
-            addr = (tx_wr + i) & 0xFFFF
-            self.w5500._write_reg(addr, tx_buf_bsb, byte)
+        self._write_tx_buffer(tx_wr, frame)
         
         # Update TX write pointer
-        new_tx_wr = (tx_wr + len(frame)) & 0xFFFF
-        self.w5500._write_reg(0x0024, socket_bsb, struct.pack('>H', new_tx_wr))
+        self._tx_wr = (tx_wr + len(frame)) & 0xFFFF
+        _wr(0x0024, socket_bsb, struct.pack(_U16, self._tx_wr))
+        
+        # Clear any stale SEND_OK so the wait below only sees this frame's
+        _wr8(0x0002, socket_bsb, 0x10)
         
         # Send command
-        self.w5500._write_reg(0x0001, socket_bsb, 0x20)  # SEND
+        _wr8(0x0001, socket_bsb, 0x20)  # SEND
+        
+        # The frame is on its way: never reuse its transaction ID, even if
+        # the wait below fails and a late reply to it still arrives
+        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
         
-        # Wait for send completion
-        for i in range(50):
-            cmd = self.w5500._read_reg(0x0001, socket_bsb, 1)[0]
-            if cmd == 0x00:  # Command completed
+        # Wait for SEND_OK - this implies the SEND command has completed, so
+        # Sn_CR isn't polled, and guarantees the next SEND starts a new segment
+        send_start = _now()
+        send_timeout = self._send_timeout_ms
+        while True:
+            sir = _rd8(0x0002, socket_bsb)
+            if sir & 0x10:  # SEND_OK
                 break
-            time.sleep_ms(10)
+            elif sir & 0x08:  # TIMEOUT (the chip has closed the socket)
+                _wr8(0x0002, socket_bsb, 0x08)  # Clear timeout
+                self._sr_cached = None
+                self.connected = False
+                raise Exception("Send timeout")
+            
+            elapsed = _diff(_now(), send_start)
+            if elapsed >= send_timeout:
+                # Frame state is unknown: force a reconnect
+                self._sr_cached = None
+                self.connected = False
+                raise Exception("Send timeout")
+            _sleep(_poll_delay(elapsed))
+    
+    def _write_tx_buffer(self, ptr, data):
+        """
+        Burst-write data into the socket 0 TX buffer at ptr
         
-        self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+        The W5500 auto-increments the address within a transaction, so this
+        is one SPI write, or two if the data crosses the 16-bit pointer wrap.
+        """
+        tx_buf_bsb = 0x02  # Socket 0 TX buffer
+        first = 0x10000 - ptr
+        if len(data) > first:
+            self.w5500._write_reg(ptr, tx_buf_bsb, data[:first])
+            self.w5500._write_reg(0x0000, tx_buf_bsb, data[first:])
+        else:
+            self.w5500._write_reg(ptr, tx_buf_bsb, data)
     
-    def _receive_modbus_response(self, timeout_ms=5000):
-        """Receive Modbus TCP response"""
-        socket_bsb = 0x01  # Socket 0
+    def _read_rx_buffer(self, ptr, length):
+        """Burst-read length bytes of the socket 0 RX buffer into the RX scratch buffer"""
         rx_buf_bsb = 0x03  # Socket 0 RX buffer
+        mv = self._rx_mv
+        end = self._rx_len
+        first = 0x10000 - ptr
+        if length > first:
+            mv[end:end + first] = self.w5500._read_reg_view(ptr, rx_buf_bsb, first)
+            mv[end + first:end + length] = self.w5500._read_reg_view(0x0000, rx_buf_bsb, length - first)
+        else:
+            mv[end:end + length] = self.w5500._read_reg_view(ptr, rx_buf_bsb, length)
+        self._rx_len = end + length
+    
+    def _drain_rx(self):
+        """
+        Move bytes waiting in the socket RX buffer into the RX scratch buffer
         
-        start_time = time.ticks_ms()
-        response_data = bytearray()
+        Invalidates any ADU view previously returned by _next_adu().
         
-        while time.ticks_diff(time.ticks_ms(), start_time) < timeout_ms:
-            # Check received data size
-            rx_rsr_bytes = self.w5500._read_reg(0x0026, socket_bsb, 2)
-            rx_rsr = struct.unpack('>H', rx_rsr_bytes)[0]
-            
-            if rx_rsr > 0:
-                # Get RX read pointer
-                rx_rd_bytes = self.w5500._read_reg(0x0028, socket_bsb, 2)
-                rx_rd = struct.unpack('>H', rx_rd_bytes)[0]
-                
-                # Read available data
-                for i in range(rx_rsr):
-                    addr = (rx_rd + i) & 0xFFFF
-                    byte = self.w5500._read_reg(addr, rx_buf_bsb, 1)[0]
-                    response_data.append(byte)
-                
-                # Update RX read pointer
-                new_rx_rd = (rx_rd + rx_rsr) & 0xFFFF
-                self.w5500._write_reg(0x0028, socket_bsb, struct.pack('>H', new_rx_rd))
-                
-                # RECV command
-                self.w5500._write_reg(0x0001, socket_bsb, 0x40)
-                
-                # Wait for RECV completion
-                for j in range(50):
-                    cmd = self.w5500._read_reg(0x0001, socket_bsb, 1)[0]
-                    if cmd == 0x00:
-                        break
-                    time.sleep_ms(10)
-                
-                # Check if we have complete response (at least MBAP header)
-                if len(response_data) >= 8:  # MBAP (7) + Function code (1) minimum
-                    return bytes(response_data)
+        Returns:
+            int: Number of bytes read
+        """
+        # Bind hot-loop lookups to locals
+        _wr = self.w5500._write_reg
+        _rd = self.w5500._read_reg_view  # Results are unpacked right away
+        _wr8 = self.w5500._write_reg_u8
+        _rd8 = self.w5500._read_reg_u8
+        _now = time.ticks_ms
+        _diff = time.ticks_diff
+        
+        socket_bsb = 0x01  # Socket 0
+        
+        # Check received data size and RX read pointer in one burst
+        # (Sn_RX_RSR and Sn_RX_RD are adjacent at 0x0026-0x0029)
+        rx_rsr, rx_rd = struct.unpack_from(_U16X2, _rd(0x0026, socket_bsb, 4))
+        
+        if rx_rsr == 0:
+            return 0
+        
+        # Move unconsumed bytes to the front of the scratch buffer, then read
+        # only as much as fits (the rest stays queued in the W5500)
+        if self._rx_off:
+            remaining = self._rx_len - self._rx_off
+            self._rx_scratch[0:remaining] = self._rx_scratch[self._rx_off:self._rx_len]
+            self._rx_off = 0
+            self._rx_len = remaining
+        rx_rsr = min(rx_rsr, len(self._rx_scratch) - self._rx_len)
+        if rx_rsr == 0:
+            return 0
+        
+        # Read available data
+        self._read_rx_buffer(rx_rd, rx_rsr)
+        
+        # Update RX read pointer
+        new_rx_rd = (rx_rd + rx_rsr) & 0xFFFF
+        _wr(0x0028, socket_bsb, struct.pack(_U16, new_rx_rd))
+        
+        # RECV command
+        _wr8(0x0001, socket_bsb, 0x40)
+        
+        # Wait for RECV completion (the chip clears Sn_CR within
+        # microseconds, so tight-poll on a short budget)
+        recv_start = _now()
+        while _rd8(0x0001, socket_bsb) != 0x00:
+            if _diff(_now(), recv_start) > 5:
+                break
+        
+        return rx_rsr
+    
+    def _next_adu(self):
+        """
+        Pop one complete ADU from the RX scratch buffer
+        
+        Returns:
+            memoryview: View of the ADU (valid until the next _drain_rx()),
+                        or None if no complete ADU has been received yet
+        """
+        off = self._rx_off
+        available = self._rx_len - off
+        if available < 8:  # MBAP (7) + Function code (1) minimum
+            return None
+        
+        # MBAP length field counts the unit ID and PDU
+        scratch = self._rx_scratch
+        total = 6 + ((scratch[off + 4] << 8) | scratch[off + 5])
+        if total < 8 or total > len(scratch):
+            # Framing is lost: drop buffered data and force a reconnect
+            self._rx_off = 0
+            self._rx_len = 0
+            self._sr_cached = None
+            self.connected = False
+            raise Exception(f"Invalid MBAP length: {total - 6}")
+        if available < total:
+            return None
+        
+        self._rx_off = off + total
+        return self._rx_mv[off:off + total]
+    
+    def _receive_modbus_response(self, timeout_ms=5000):
+        """Receive one complete Modbus TCP response (ADU)"""
+        # Bind hot-loop lookups to locals
+        _now = time.ticks_ms
+        _diff = time.ticks_diff
+        _sleep = time.sleep_ms
+        
+        start_time = _now()
+        
+        while True:
+            adu = self._next_adu()
+            if adu is not None:
+                return adu
             
-            time.sleep_ms(50)
+            elapsed = _diff(_now(), start_time)
+            if elapsed >= timeout_ms:
+                break
+            
+            if not self._drain_rx():
+                delay = _poll_delay(elapsed)
+                _sleep(min(delay, 1) if self.low_latency else delay)
         
+        self._sr_cached = None
         raise Exception("Response timeout")
     
+    def _dispatch_response(self, adu):
+        """Hand a response to whoever is waiting on its transaction ID"""
+        tid = (adu[0] << 8) | adu[1]
+        if tid not in self._pending:
+            return  # Stale response (e.g. after a timeout) - drop it
+        
+        callback = self._pending.pop(tid)
+        if callback is None:
+            self._completed[tid] = bytes(adu)  # Outlives the RX scratch buffer
+        else:
+            callback(tid, adu)
+    
+    def send_pdu_async(self, pdu, callback=None):
+        """
+        Send a Modbus request without waiting for the response
+        
+        Several requests can be in flight at once; responses are matched
+        back to requests by MBAP transaction ID.
+        
+        Args:
+            pdu: Modbus PDU (function code + data), at most 253 bytes
+            callback: Optional callable(tid, response), run from
+                      poll_responses() when the response arrives
+            
+        Returns:
+            int: Transaction ID, for use with wait_for()
+        """
+        tid = self._send_modbus_frame(pdu)
+        self._pending[tid] = callback
+        return tid
+    
+    def poll_responses(self):
+        """
+        Drain received data and dispatch complete responses (non-blocking)
+        
+        Returns:
+            int: Number of responses dispatched
+        """
+        self._drain_rx()
+        
+        count = 0
+        adu = self._next_adu()
+        while adu is not None:
+            self._dispatch_response(adu)
+            count += 1
+            adu = self._next_adu()
+        return count
+    
+    def wait_for(self, tid, timeout_ms=5000):
+        """
+        Wait for the response to a request sent with send_pdu_async()
+        
+        Args:
+            tid: Transaction ID returned by send_pdu_async() (sent
+                 without a callback)
+            timeout_ms: Response timeout in milliseconds
+            
+        Returns:
+            memoryview: Complete response ADU (MBAP header + PDU), valid
+                        until the next receive
+        """
+        start_time = time.ticks_ms()
+        try:
+            while tid not in self._completed:
+                remaining = timeout_ms - time.ticks_diff(time.ticks_ms(), start_time)
+                adu = self._receive_modbus_response(remaining)
+                if ((adu[0] << 8) | adu[1]) == tid:
+                    self._pending.pop(tid, None)
+                    return adu  # Straight from the RX scratch buffer, no copy
+                self._dispatch_response(adu)
+        except Exception:
+            self._pending.pop(tid, None)
+            raise
+        
+        return self._completed.pop(tid)
+    
+    def _transact(self, func_code, address, value):
+        """Send a fixed-size request and wait for its response"""
+        tid = self._send_request(func_code, address, value)
+        self._pending[tid] = None
+        return self.wait_for(tid)
+    
     def read_holding_registers(self, start_address, count):
         """
         Read holding registers from Siemens PLC
@@ -349,33 +698,24 @@ class SiemensModbusTCP:
         if count > 125:  # Modbus TCP limit
             raise ValueError("Maximum 125 registers per request")
         
-        # Build PDU (Function 3 - Read Holding Registers)
-        pdu = struct.pack('>BHH', 3, start_address, count)
-        
         try:
-            self._send_modbus_frame(pdu)
-            response = self._receive_modbus_response()
+            # Function 3 - Read Holding Registers
+            response = self._transact(3, start_address, count)
             
             # Parse response
             if len(response) < 9:
                 raise Exception("Response too short")
             
             # Check MBAP header
-            trans_id, proto_id, length, unit_id, func_code = struct.unpack('>HHHBB', response[:8])
+            trans_id, proto_id, length, unit_id, func_code = struct.unpack_from(_HDR8, response, 0)
             
             if func_code == 3:  # Success
                 byte_count = response[8]
                 if len(response) < 9 + byte_count:
                     raise Exception("Incomplete response")
                 
-                data = response[9:9+byte_count]
-                registers = []
-                
-                for i in range(0, len(data), 2):
-                    reg_value = struct.unpack('>H', data[i:i+2])[0]
-                    registers.append(reg_value)
-                
-                return registers
+                # Decode all registers in a single unpack, straight from the response
+                return list(struct.unpack_from('>%dH' % (byte_count // 2), response, 9))
                 
             elif func_code == 0x83:  # Error response
                 error_code = response[8]
@@ -387,6 +727,51 @@ class SiemensModbusTCP:
             print(f"Read holding registers failed: {e}")
             return None
     
+    def read_ranges(self, ranges, max_gap=8, max_regs=125):
+        """
+        Read several holding register ranges using as few requests as possible
+        
+        Ranges that lie within max_gap registers of each other are merged
+        into a single read (never larger than max_regs) and the results are
+        split back out per range.
+        
+        Args:
+            ranges: List of (start_address, count) tuples
+            max_gap: Largest gap (in registers) bridged when merging
+            max_regs: Maximum registers per merged request
+            
+        Returns:
+            dict: (start_address, count) -> list of register values,
+                  or None for ranges whose read failed
+        """
+        ranges = sorted(ranges)
+        
+        # Merge ranges into [lo, hi) spans, remembering which span owns each
+        spans = []
+        owners = []
+        for start, count in ranges:
+            if count > max_regs:
+                raise ValueError(f"Maximum {max_regs} registers per range")
+            end = start + count
+            if spans and start <= spans[-1][1] + max_gap and end - spans[-1][0] <= max_regs:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+            owners.append(len(spans) - 1)
+        
+        span_regs = [self.read_holding_registers(lo, hi - lo) for lo, hi in spans]
+        
+        # Demultiplex
+        results = {}
+        for (start, count), owner in zip(ranges, owners):
+            regs = span_regs[owner]
+            if regs is None:
+                results[(start, count)] = None
+            else:
+                offset = start - spans[owner][0]
+                results[(start, count)] = regs[offset:offset + count]
+        return results
+    
     def write_single_register(self, address, value):
         """
         Write single holding register to Siemens PLC
@@ -398,17 +783,14 @@ class SiemensModbusTCP:
         Returns:
             bool: True if successful
         """
-        # Build PDU (Function 6 - Write Single Register)
-        pdu = struct.pack('>BHH', 6, address, value & 0xFFFF)
-        
         try:
-            self._send_modbus_frame(pdu)
-            response = self._receive_modbus_response()
+            # Function 6 - Write Single Register
+            response = self._transact(6, address, value & 0xFFFF)
             
             if len(response) < 8:
                 raise Exception("Response too short")
             
-            trans_id, proto_id, length, unit_id, func_code = struct.unpack('>HHHBB', response[:8])
+            trans_id, proto_id, length, unit_id, func_code = struct.unpack_from(_HDR8, response, 0)
             
             if func_code == 6:  # Success - echo of request
                 return True
@@ -437,22 +819,19 @@ class SiemensModbusTCP:
             raise ValueError("Maximum 123 registers per request")
         
         # Build data bytes
-        data_bytes = bytearray()
-        for value in values:
-            data_bytes.extend(struct.pack('>H', value & 0xFFFF))
+        data_bytes = struct.pack('>%dH' % len(values), *[v & 0xFFFF for v in values])
         
         # Build PDU (Function 16 - Write Multiple Registers)
-        pdu = struct.pack('>BHHB', 16, start_address, len(values), len(data_bytes))
+        pdu = struct.pack(_PDU_WR_MULTI, 16, start_address, len(values), len(data_bytes))
         pdu += data_bytes
         
         try:
-            self._send_modbus_frame(pdu)
-            response = self._receive_modbus_response()
+            response = self.wait_for(self.send_pdu_async(pdu))
             
             if len(response) < 8:
                 raise Exception("Response too short")
             
-            trans_id, proto_id, length, unit_id, func_code = struct.unpack('>HHHBB', response[:8])
+            trans_id, proto_id, length, unit_id, func_code = struct.unpack_from(_HDR8, response, 0)
             
             if func_code == 16:  # Success
                 return True
@@ -480,31 +859,22 @@ class SiemensModbusTCP:
         if count > 125:  # Modbus TCP limit
             raise ValueError("Maximum 125 registers per request")
         
-        # Build PDU (Function 4 - Read Input Registers)
-        pdu = struct.pack('>BHH', 4, start_address, count)
-        
         try:
-            self._send_modbus_frame(pdu)
-            response = self._receive_modbus_response()
+            # Function 4 - Read Input Registers
+            response = self._transact(4, start_address, count)
             
             if len(response) < 9:
                 raise Exception("Response too short")
             
-            trans_id, proto_id, length, unit_id, func_code = struct.unpack('>HHHBB', response[:8])
+            trans_id, proto_id, length, unit_id, func_code = struct.unpack_from(_HDR8, response, 0)
             
             if func_code == 4:  # Success
                 byte_count = response[8]
                 if len(response) < 9 + byte_count:
                     raise Exception("Incomplete response")
                 
-                data = response[9:9+byte_count]
-                registers = []
-                
-                for i in range(0, len(data), 2):
-                    reg_value = struct.unpack('>H', data[i:i+2])[0]
-                    registers.append(reg_value)
-                
-                return registers
+                # Decode all registers in a single unpack, straight from the response
+                return list(struct.unpack_from('>%dH' % (byte_count // 2), response, 9))
                 
             elif func_code == 0x84:  # Error response
                 error_code = response[8]
@@ -521,13 +891,21 @@ class SiemensModbusTCP:
         if not self.connected:
             return False
         
+        # Reuse a recent status read rather than hitting SPI on every check
+        now = time.ticks_ms()
+        if self._sr_cached is not None and time.ticks_diff(now, self._sr_ts) < 50:
+            return self._sr_cached == 0x17  # SOCK_ESTABLISHED
+        
         # Check socket status
         try:
             socket_bsb = 0x01
-            status = self.w5500._read_reg(0x0003, socket_bsb, 1)[0]
-            return status == 0x17  # SOCK_ESTABLISHED
-        except:
+            status = self.w5500._read_reg_u8(0x0003, socket_bsb)
+        except OSError:
             return False
+        
+        self._sr_cached = status
+        self._sr_ts = now
+        return status == 0x17  # SOCK_ESTABLISHED
     
     def reconnect(self):
         """Reconnect to PLC after connection loss"""
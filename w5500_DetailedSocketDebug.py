@@ -5,35 +5,34 @@ Focuses on socket state debugging and proper initialization
 
 import time
 from w5500_driver import W5500
+from w5500_diag_common import (GATEWAY, GATEWAY_BYTES, GOOGLE_DNS_BYTES,
+                               IP_ADDR, MAC_ADDR, SOCK_BSB, SUBNET_MASK,
+                               apply_network_config, close_socket, full_reset,
+                               ip_bytes, ip_str, open_tcp, phy_reset,
+                               wait_for_link, wait_socket_event)
 
-# Network configuration
-IP_ADDR = "192.168.15.28"
-SUBNET_MASK = "255.255.255.0"
-GATEWAY = "192.168.15.1"
-MAC_ADDR = "02:08:dc:15:00:28"
+# Dump all 8 sockets before and after reset (set False to skip the dumps)
+DEBUG_DUMP = True
 
 def print_socket_details(w, sock_num):
     """Print detailed socket information for debugging"""
     try:
-        socket_bsb = 0x01 + (sock_num * 4)
+        socket_bsb = SOCK_BSB[sock_num]
         
-        # Read socket registers
-        mode = w._read_reg(0x0000, socket_bsb, 1)[0]  # Sn_MR
-        cmd = w._read_reg(0x0001, socket_bsb, 1)[0]   # Sn_CR
-        status = w._read_reg(0x0003, socket_bsb, 1)[0] # Sn_SR
-        port_bytes = w._read_reg(0x0004, socket_bsb, 2) # Sn_PORT
-        port = (port_bytes[0] << 8) | port_bytes[1]
+        # Read Sn_MR..Sn_DPORT (0x0000-0x0011) in one burst
+        blk = w._read_reg(0x0000, socket_bsb, 0x12)
+        mode, cmd, _, status = blk[0:4]  # Sn_MR, Sn_CR, Sn_IR, Sn_SR
+        port = (blk[4] << 8) | blk[5]   # Sn_PORT
         
         print(f"Socket {sock_num}:")
         print(f"  Mode: 0x{mode:02x}, Cmd: 0x{cmd:02x}, Status: 0x{status:02x}")
         print(f"  Port: {port}")
         
         if status != 0x00:  # Not closed
-            # Read destination info if available
-            dest_ip = w._read_reg(0x000C, socket_bsb, 4)  # Sn_DIPR
-            dest_port_bytes = w._read_reg(0x0010, socket_bsb, 2)  # Sn_DPORT
-            dest_port = (dest_port_bytes[0] << 8) | dest_port_bytes[1]
-            print(f"  Dest: {'.'.join(map(str, dest_ip))}:{dest_port}")
+            # Destination info from the same block
+            dest_ip = blk[0x0C:0x10]  # Sn_DIPR
+            dest_port = (blk[0x10] << 8) | blk[0x11]  # Sn_DPORT
+            print(f"  Dest: {ip_str(dest_ip)}:{dest_port}")
             
     except Exception as e:
         print(f"Socket {sock_num}: Error reading - {e}")
@@ -42,108 +41,60 @@ def comprehensive_reset(w):
     """More comprehensive reset with verification"""
     print("Starting comprehensive reset...")
     
-    # 1. Close all sockets first
-    print("1. Closing all sockets...")
-    for sock in range(8):
-        try:
-            socket_bsb = 0x01 + (sock * 4)
-            w._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE command
-            time.sleep_ms(5)
-            # Wait for close to complete
-            for _ in range(10):
-                status = w._read_reg(0x0003, socket_bsb, 1)[0]
-                if status == 0x00:  # SOCK_CLOSED
-                    break
-                time.sleep_ms(5)
-        except:
-            pass
-    
-    # 2. Hardware reset
-    print("2. Hardware reset...")
-    w.rst.value(0)
-    time.sleep_ms(5)  # Longer reset pulse
-    w.rst.value(1)
-    time.sleep_ms(50)  # Longer stabilization
-    
-    # 3. Software reset
-    print("3. Software reset...")
-    w._write_reg(0x0000, 0x00, 0x80)  # Set RST bit in MR
-    time.sleep_ms(50)
-    
-    # 4. Verify reset completed
-    print("4. Verifying reset...")
-    for attempt in range(10):
-        try:
-            version = w._read_reg(0x0039, 0x00, 1)[0]  # VERSIONR
-            if version == 0x04:
-                print("   Reset verified - chip responding")
-                break
-        except:
-            pass
-        time.sleep_ms(10)
-    else:
+    # 1. Hardware + software reset (also closes all sockets), VERSIONR check
+    print("1. Hardware + software reset...")
+    if not full_reset(w):
         print("   WARNING: Reset verification failed")
         return False
+    print("   Reset verified - chip responding")
     
-    # 5. Reset PHY
-    print("5. PHY reset...")
+    # 2. Reset PHY
+    print("2. PHY reset...")
     try:
-        # Read current PHYCFGR
-        phycfgr = w._read_reg(0x002E, 0x00, 1)[0]
-        print(f"   Current PHYCFGR: 0x{phycfgr:02x}")
-        
-        # Reset PHY (clear bit 7, then set it)
-        w._write_reg(0x002E, 0x00, phycfgr & 0x7F)
-        time.sleep_ms(10)
-        w._write_reg(0x002E, 0x00, phycfgr | 0x80)
-        time.sleep_ms(100)
-        
-        # Read back
-        phycfgr_new = w._read_reg(0x002E, 0x00, 1)[0]
-        print(f"   New PHYCFGR: 0x{phycfgr_new:02x}")
-        
+        phycfgr, phycfgr_new = phy_reset(w)
+        print(f"   PHYCFGR: 0x{phycfgr:02x} -> 0x{phycfgr_new:02x}")
     except Exception as e:
         print(f"   PHY reset error: {e}")
     
-    # 6. Clear any pending interrupts
-    print("6. Clearing interrupts...")
+    # 3. Clear any pending interrupts
+    print("3. Clearing interrupts...")
     try:
-        w._write_reg(0x0015, 0x00, 0xFF)  # Clear IR
-        w._write_reg(0x0017, 0x00, 0x00)  # Clear SIR
-    except:
-        pass
+        w._write_reg_u8(0x0015, 0x00, 0xFF)  # Clear IR
+        w._write_reg_u8(0x0017, 0x00, 0x00)  # Clear SIR
+    except Exception as e:
+        print(f"   Interrupt clear error: {e}")
     
     print("Reset sequence complete")
     return True
 
-def configure_network_detailed(w):
-    """Configure network with detailed verification"""
+def configure_network_detailed(w, verify=False):
+    """Configure network, optionally reading every setting back to verify it"""
     print("Configuring network settings...")
     
-    # Set MAC
-    w.set_mac_address(MAC_ADDR)
+    apply_network_config(w)
+    
+    if not verify:
+        # Fast path (e.g. retries): trust the writes, skip readbacks
+        return True
+    
     time.sleep_ms(10)
+    
+    # Verify MAC
     mac_verify = w.get_mac_address()
     print(f"MAC: Set {MAC_ADDR} -> Read {mac_verify}")
     
-    # Set IP
-    w.set_ip_address(IP_ADDR)
-    time.sleep_ms(10)
+    # Verify IP
     ip_verify = w.get_ip_address()
     print(f"IP:  Set {IP_ADDR} -> Read {ip_verify}")
     
-    # Set Subnet
-    w.set_subnet_mask(SUBNET_MASK)
-    time.sleep_ms(10)
+    # Verify Subnet
     subnet_bytes = w._read_reg(0x0005, 0x00, 4)
-    subnet_verify = '.'.join(map(str, subnet_bytes))
+    subnet_verify = ip_str(subnet_bytes)
     print(f"Subnet: Set {SUBNET_MASK} -> Read {subnet_verify}")
     
-    # Set Gateway
-    w.set_gateway(GATEWAY)
-    time.sleep_ms(10)
+    # Verify Gateway
     gw_bytes = w._read_reg(0x0001, 0x00, 4)
-    gw_verify = '.'.join(map(str, gw_bytes))
+    gw_verify = ip_str(gw_bytes)
     print(f"Gateway: Set {GATEWAY} -> Read {gw_verify}")
     
     # Verify all settings match
@@ -160,68 +111,43 @@ def wait_for_phy_link(w, timeout_ms=10000):
     print("Waiting for PHY link...")
     
     start_time = time.ticks_ms()
-    link_attempts = 0
+    phy = wait_for_link(w, timeout_ms)
+    elapsed = time.ticks_diff(time.ticks_ms(), start_time)
     
-    while time.ticks_diff(time.ticks_ms(), start_time) < timeout_ms:
-        try:
-            phy = w.get_phy_status()
-            link_attempts += 1
-            
-            if phy['link']:
-                print(f"PHY Link UP after {link_attempts} attempts")
-                print(f"  Speed: {'100M' if phy['speed_100m'] else '10M'}")
-                print(f"  Duplex: {'Full' if phy['full_duplex'] else 'Half'}")
-                print(f"  Raw: 0x{phy['raw_value']:02x}")
-                return True
-                
-            if link_attempts % 20 == 0:  # Print status every 2 seconds
-                print(f"  Attempt {link_attempts}: Link DOWN (raw: 0x{phy['raw_value']:02x})")
-                
-        except Exception as e:
-            print(f"  PHY read error: {e}")
-            
-        time.sleep_ms(100)
+    if phy and phy['link']:
+        print(f"PHY Link UP after {elapsed}ms")
+        print(f"  Speed: {'100M' if phy['speed_100m'] else '10M'}")
+        print(f"  Duplex: {'Full' if phy['full_duplex'] else 'Half'}")
+        print(f"  Raw: 0x{phy['raw_value']:02x}")
+        return True
     
-    print(f"PHY link timeout after {link_attempts} attempts")
+    if phy:
+        print(f"PHY link timeout after {elapsed}ms (raw: 0x{phy['raw_value']:02x})")
+    else:
+        print(f"PHY link timeout after {elapsed}ms (PHYCFGR unreadable)")
     return False
 
 def detailed_tcp_connect(w, sock_num, dest_ip, dest_port, timeout_ms=5000):
     """TCP connect with detailed socket state monitoring"""
-    print(f"Detailed TCP connect to {dest_ip}:{dest_port} using socket {sock_num}")
+    # Bind hot-loop lookups to locals
+    _wr = w._write_reg
+    _wr8 = w._write_reg_u8
+    
+    print(f"Detailed TCP connect to {ip_str(dest_ip)}:{dest_port} using socket {sock_num}")
     
-    socket_bsb = 0x01 + (sock_num * 4)
+    socket_bsb = SOCK_BSB[sock_num]
     
     try:
         # 1. Ensure socket is closed
         print("1. Ensuring socket is closed...")
-        w._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE command
-        time.sleep_ms(10)
-        
-        # Wait for close
-        for i in range(10):
-            status = w._read_reg(0x0003, socket_bsb, 1)[0]
-            if status == 0x00:  # SOCK_CLOSED
-                break
-            time.sleep_ms(5)
-        else:
+        if not close_socket(w, sock_num):
             print("   WARNING: Socket didn't close properly")
         
         print_socket_details(w, sock_num)
         
         # 2. Open socket
         print("2. Opening TCP socket...")
-        w._write_reg(0x0000, socket_bsb, 0x01)  # TCP mode
-        w._write_reg(0x0004, socket_bsb, [(50000 + sock_num) >> 8, (50000 + sock_num) & 0xFF])  # Source port
-        w._write_reg(0x0001, socket_bsb, 0x01)  # OPEN command
-        
-        # Wait for open to complete
-        for i in range(50):  # 500ms timeout
-            cmd = w._read_reg(0x0001, socket_bsb, 1)[0]
-            if cmd == 0x00:  # Command completed
-                break
-            time.sleep_ms(10)
-        
-        status = w._read_reg(0x0003, socket_bsb, 1)[0]
+        status = open_tcp(w, sock_num)  # 500ms timeout
         print(f"   Socket status after open: 0x{status:02x}")
         
         if status != 0x13:  # Not SOCK_INIT
@@ -232,38 +158,29 @@ def detailed_tcp_connect(w, sock_num, dest_ip, dest_port, timeout_ms=5000):
         
         # 3. Set destination
         print("3. Setting destination...")
-        dest_bytes = [int(x) for x in dest_ip.split('.')]
-        w._write_reg(0x000C, socket_bsb, dest_bytes)  # Destination IP
-        w._write_reg(0x0010, socket_bsb, [dest_port >> 8, dest_port & 0xFF])  # Destination port
+        dest_bytes = ip_bytes(dest_ip)
+        _wr(0x000C, socket_bsb, dest_bytes + bytes((dest_port >> 8, dest_port & 0xFF)))  # Destination IP + port
         
         # 4. Connect
         print("4. Initiating connection...")
-        w._write_reg(0x0001, socket_bsb, 0x04)  # CONNECT command
+        _wr8(0x0002, socket_bsb, 0xFF)  # Clear interrupts from any earlier attempt
+        _wr8(0x0001, socket_bsb, 0x04)  # CONNECT command
         
         # 5. Wait for connection
         print("5. Waiting for connection...")
-        start_time = time.ticks_ms()
+        cmd, sir, status = wait_socket_event(w, socket_bsb, 0x01, 0x08, timeout_ms, trace=True)
         
-        while time.ticks_diff(time.ticks_ms(), start_time) < timeout_ms:
-            # Check if command completed
-            cmd = w._read_reg(0x0001, socket_bsb, 1)[0]
-            status = w._read_reg(0x0003, socket_bsb, 1)[0]
-            
-            print(f"   Status: 0x{status:02x}, Cmd: 0x{cmd:02x}")
-            
-            if status == 0x17:  # SOCK_ESTABLISHED
-                print("   SUCCESS: Connection established!")
-                return True
-            elif status == 0x00:  # SOCK_CLOSED
-                print("   FAILED: Socket closed (connection refused/reset)")
-                break
-            elif status == 0x13 and cmd == 0x00:  # Still in INIT but command done
-                print("   FAILED: Connect command completed but no connection")
-                break
-                
-            time.sleep_ms(100)
-        
-        print("   TIMEOUT: Connection attempt timed out")
+        if status == 0x17:  # SOCK_ESTABLISHED
+            print("   SUCCESS: Connection established!")
+            return True
+        elif status == 0x00:  # SOCK_CLOSED
+            print("   FAILED: Socket closed (connection refused/reset)")
+        elif sir & 0x08:  # TIMEOUT interrupt
+            print("   FAILED: Connection timeout (ARP or TCP)")
+        elif status == 0x13 and cmd == 0x00:  # Still in INIT but command done
+            print("   FAILED: Connect command completed but no connection")
+        else:
+            print("   TIMEOUT: Connection attempt timed out")
         return False
         
     except Exception as e:
@@ -272,7 +189,7 @@ def detailed_tcp_connect(w, sock_num, dest_ip, dest_port, timeout_ms=5000):
     finally:
         # Always try to close socket
         try:
-            w._write_reg(0x0001, socket_bsb, 0x10)  # CLOSE command
+            _wr8(0x0001, socket_bsb, 0x10)  # CLOSE command
         except:
             pass
 
@@ -289,9 +206,10 @@ def main_debug():
         return
     
     # Check initial socket states
-    print("\nInitial socket states:")
-    for i in range(8):
-        print_socket_details(w, i)
+    if DEBUG_DUMP:
+        print("\nInitial socket states:")
+        for i in range(8):
+            print_socket_details(w, i)
     
     # Comprehensive reset
     if not comprehensive_reset(w):
@@ -299,7 +217,7 @@ def main_debug():
         return
     
     # Configure network
-    if not configure_network_detailed(w):
+    if not configure_network_detailed(w, verify=True):
         print("Network configuration failed")
         return
     
@@ -309,9 +227,10 @@ def main_debug():
         return
     
     # Check socket states after reset/config
-    print("\nSocket states after reset/config:")
-    for i in range(8):
-        print_socket_details(w, i)
+    if DEBUG_DUMP:
+        print("\nSocket states after reset/config:")
+        for i in range(8):
+            print_socket_details(w, i)
     
     # Test connections with detailed monitoring
     print("\n" + "=" * 50)
@@ -319,17 +238,17 @@ def main_debug():
     print("=" * 50)
     
     # Test gateway
-    gateway_ok = detailed_tcp_connect(w, 0, GATEWAY, 80)
+    gateway_ok = detailed_tcp_connect(w, 0, GATEWAY_BYTES, 80)
     time.sleep_ms(500)
     
     if not gateway_ok:
         print("\nTrying gateway on port 53...")
-        gateway_ok = detailed_tcp_connect(w, 1, GATEWAY, 53)
+        gateway_ok = detailed_tcp_connect(w, 1, GATEWAY_BYTES, 53)
         time.sleep_ms(500)
     
     # Test Google DNS
     print(f"\nTesting Google DNS...")
-    google_ok = detailed_tcp_connect(w, 2, "8.8.8.8", 53)
+    google_ok = detailed_tcp_connect(w, 2, GOOGLE_DNS_BYTES, 53)
     
     # Results
     print("\n" + "=" * 50)
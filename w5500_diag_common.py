@@ -0,0 +1,215 @@
+"""
+W5500 Diagnostic Helpers
+Shared network settings, socket open/close/wait helpers and reset sequence
+used by the ARP, detailed socket and reset diagnostic scripts.
+The polling helpers are compiled with @micropython.native.
+"""
+
+import time
+import machine
+import micropython
+
+# Network configuration
+IP_ADDR = "192.168.15.28"
+SUBNET_MASK = "255.255.255.0"
+GATEWAY = "192.168.15.1"
+MAC_ADDR = "02:08:dc:15:00:28"
+
+# Same addresses pre-encoded for register writes
+IP_ADDR_BYTES = b'\xc0\xa8\x0f\x1c'
+SUBNET_MASK_BYTES = b'\xff\xff\xff\x00'
+GATEWAY_BYTES = b'\xc0\xa8\x0f\x01'
+GOOGLE_DNS_BYTES = b'\x08\x08\x08\x08'
+MAC_BYTES = bytes(int(x, 16) for x in MAC_ADDR.split(':'))
+
+# Print socket state changes while waiting on connect/ARP events
+DEBUG_TRACE = True
+
+# Per-socket constants
+SOCK_BSB = tuple(0x01 + i * 4 for i in range(8))  # Socket n register block select
+SRC_PORTS = tuple(bytes(((50000 + i) >> 8, (50000 + i) & 0xFF)) for i in range(8))
+# Sn_MR..Sn_PORT (0x0000-0x0005) as one burst: CR=0 is no command, IR=0
+# clears nothing and SR is read-only, so only MR and PORT take effect
+TCP_OPEN_BLK = tuple(b'\x01\x00\x00\x00' + p for p in SRC_PORTS)
+
+# Parsed address cache (scripts connect to the same few targets repeatedly)
+_IP_CACHE = {}
+
+def ip_bytes(s):
+    """Convert dotted IP string to 4 bytes, memoized (bytes pass through)"""
+    if isinstance(s, bytes):
+        return s
+    b = _IP_CACHE.get(s)
+    if b is None:
+        b = bytes(int(x) for x in s.split('.'))
+        _IP_CACHE[s] = b
+    return b
+
+def ip_str(b):
+    """Format address bytes as a dotted string (print paths only)"""
+    if isinstance(b, str):
+        return b
+    return '.'.join(map(str, b))
+
+def apply_network_config(w):
+    """Write MAC, IP, subnet mask and gateway"""
+    w.set_mac_address(MAC_BYTES)
+    w.set_ip_address(IP_ADDR_BYTES)
+    w.set_gateway_and_mask(GATEWAY_BYTES, SUBNET_MASK_BYTES)
+
+@micropython.native
+def read_status_block(w, socket_bsb):
+    """Read Sn_CR, Sn_IR and Sn_SR (contiguous at 0x0001-0x0003) in one burst"""
+    cmd, sir, status = w._read_reg_view(0x0001, socket_bsb, 3)
+    return cmd, sir, status
+
+@micropython.native
+def wait_status(w, socket_bsb, target, timeout_ms):
+    """Poll Sn_SR every 1ms until it equals target or timeout_ms expires.
+    Returns the last status read"""
+    _rd8 = w._read_reg_u8
+    _diff = time.ticks_diff
+    _ms = time.ticks_ms
+    _sleep = time.sleep_ms
+    deadline = time.ticks_add(_ms(), timeout_ms)
+    while True:
+        status = _rd8(0x0003, socket_bsb)
+        if status == target or _diff(deadline, _ms()) <= 0:
+            return status
+        _sleep(1)
+
+@micropython.native
+def wait_socket_event(w, socket_bsb, mask_ok, mask_fail, timeout_ms, trace=False):
+    """Poll Sn_IR until a bit in mask_ok/mask_fail is set, the socket closes or
+    timeout_ms expires, backing off 1, 2, 4 ... 50 ms between reads.
+    Returns (cmd, sir, status) from the last read"""
+    _diff = time.ticks_diff
+    _ms = time.ticks_ms
+    _sleep = time.sleep_ms
+    delay = 1
+    last_state = None
+    deadline = time.ticks_add(_ms(), timeout_ms)
+    while True:
+        cmd, sir, status = read_status_block(w, socket_bsb)
+        if trace and DEBUG_TRACE and (status, cmd, sir) != last_state:
+            # Edge-triggered: only log when the socket state changes
+            print(f"   Status: 0x{status:02x}, Cmd: 0x{cmd:02x}, INT: 0x{sir:02x}")
+            last_state = (status, cmd, sir)
+        if sir & (mask_ok | mask_fail) or status == 0x00:
+            break
+        if _diff(deadline, _ms()) <= 0:
+            break
+        _sleep(delay)
+        delay = min(delay * 2, 50)
+    return cmd, sir, status
+
+def wait_for_link(w, timeout_ms, period_ms=100, report_ms=2000):
+    """Wait for PHY link without busy-polling: a periodic machine.Timer reads
+    PHYCFGR while the CPU sits in machine.idle(). Read errors are printed as
+    they happen and the link state every report_ms (0 disables it). Returns
+    the last PHY status dict read (check its 'link' key), or None if PHYCFGR
+    never read back"""
+    # [last status, pending read error, read attempts]
+    state = [None, None, 0]
+    
+    def _poll():
+        state[2] += 1
+        try:
+            phy = w.get_phy_status()
+        except Exception as e:
+            state[1] = e
+            return False
+        state[0] = phy
+        return phy['link']
+    
+    def _phy_cb(t):
+        if _poll():
+            t.deinit()
+    
+    def _report_error():
+        # Printed from the main loop, not the timer callback
+        err = state[1]
+        if err is not None:
+            state[1] = None
+            print(f"  PHY read error: {err}")
+    
+    # Link is often already up; don't wait a full period to find out
+    if _poll():
+        return state[0]
+    _report_error()
+    
+    timer = machine.Timer(-1)
+    timer.init(period=period_ms, mode=machine.Timer.PERIODIC, callback=_phy_cb)
+    try:
+        _diff = time.ticks_diff
+        _ms = time.ticks_ms
+        _idle = machine.idle
+        last_report = _ms()
+        deadline = time.ticks_add(last_report, timeout_ms)
+        while not (state[0] and state[0]['link']) and _diff(deadline, _ms()) > 0:
+            _idle()
+            _report_error()
+            if report_ms and _diff(_ms(), last_report) >= report_ms:
+                last_report = _ms()
+                phy = state[0]
+                if phy:
+                    print(f"  Attempt {state[2]}: Link DOWN (raw: 0x{phy['raw_value']:02x})")
+                else:
+                    print(f"  Attempt {state[2]}: Link DOWN (PHYCFGR unreadable)")
+    finally:
+        timer.deinit()
+    _report_error()
+    return state[0]
+
+def close_socket(w, sock_num, timeout_ms=50):
+    """Issue CLOSE and wait for SOCK_CLOSED. Returns True if it closed"""
+    socket_bsb = SOCK_BSB[sock_num]
+    w._write_reg_u8(0x0001, socket_bsb, 0x10)  # CLOSE command
+    return wait_status(w, socket_bsb, 0x00, timeout_ms) == 0x00
+
+def open_tcp(w, sock_num, port=None, timeout_ms=500):
+    """Open sock_num in TCP mode on port (default 50000 + sock_num).
+    Returns Sn_SR afterwards; 0x13 (SOCK_INIT) means success"""
+    socket_bsb = SOCK_BSB[sock_num]
+    if port is None:
+        blk = TCP_OPEN_BLK[sock_num]
+    else:
+        blk = b'\x01\x00\x00\x00' + bytes((port >> 8, port & 0xFF))
+    w._write_reg(0x0000, socket_bsb, blk)  # TCP mode + source port
+    w._write_reg_u8(0x0001, socket_bsb, 0x01)  # OPEN command
+    return wait_status(w, socket_bsb, 0x13, timeout_ms)
+
+def full_reset(w):
+    """Hardware reset, then MR software reset (which also closes every
+    socket), then confirm VERSIONR reads 0x04. Returns True if verified"""
+    _rd8 = w._read_reg_u8
+    _sleep = time.sleep_ms
+
+    # Hardware reset
+    w.rst.value(0)
+    _sleep(1)
+    w.rst.value(1)
+    _sleep(10)
+
+    # Software reset via Mode Register (MR)
+    w._write_reg_u8(0x0000, 0x00, 0x80)  # Set RST bit in MR
+    _sleep(2)  # Reset completes in well under 1ms
+
+    # Verify chip responds
+    for attempt in range(10):
+        try:
+            if _rd8(0x0039, 0x00) == 0x04:  # VERSIONR
+                return True
+        except:
+            pass
+        _sleep(10)
+    return False
+
+def phy_reset(w):
+    """Pulse the PHYCFGR reset bit. Returns (before, after) PHYCFGR values"""
+    phycfgr = w._read_reg_u8(0x002E, 0x00)
+    w._write_reg_u8(0x002E, 0x00, phycfgr & 0x7F)  # Clear RST bit
+    time.sleep_ms(10)
+    w._write_reg_u8(0x002E, 0x00, phycfgr | 0x80)  # Set RST bit
+    time.sleep_ms(100)
+    return phycfgr, w._read_reg_u8(0x002E, 0x00)
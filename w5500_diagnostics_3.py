@@ -5,51 +5,28 @@ Copy this code and run it directly in Thonny
 
 import time
 from w5500_driver import W5500
-
-# Network configuration
-IP_ADDR = "192.168.15.28"
-SUBNET_MASK = "255.255.255.0"
-GATEWAY = "192.168.15.1"
-MAC_ADDR = "02:08:DC:15:00:28"
+from w5500_diag_common import (GATEWAY, GATEWAY_BYTES, GOOGLE_DNS_BYTES,
+                               SOCK_BSB, apply_network_config, full_reset,
+                               ip_bytes, ip_str, phy_reset, wait_for_link,
+                               wait_socket_event)
 
 def full_w5500_reset(w):
     """Complete W5500 reset sequence"""
     print("Performing full W5500 reset...")
     
-    # 1. Hardware reset
-    w.rst.value(0)
-    time.sleep_ms(1)
-    w.rst.value(1)
-    time.sleep_ms(10)
-    
-    # 2. Software reset via Mode Register (MR)
-    w._write_reg(0x0000, 0x00, 0x80)  # Set RST bit in MR
-    time.sleep_ms(10)
-    
-    # 3. PHY reset via PHYCFGR
-    phycfgr = w._read_reg(0x002E, 0x00, 1)[0]  # Read PHYCFGR
-    w._write_reg(0x002E, 0x00, phycfgr & 0x7F)  # Clear RST bit
-    time.sleep_ms(10)
-    w._write_reg(0x002E, 0x00, phycfgr | 0x80)  # Set RST bit
-    time.sleep_ms(50)
-    
-    # 4. Close all sockets
-    for sock in range(8):
-        try:
-            w.socket_close(sock)
-        except:
-            pass
+    # 1. Hardware + software reset (MR reset also closes all sockets)
+    if not full_reset(w):
+        print("WARNING: chip did not respond after reset")
+    
+    # 2. PHY reset via PHYCFGR
+    phy_reset(w)
     
-    time.sleep_ms(50)
     print("Reset complete!")
 
 def configure_network(w):
     """Configure W5500 network settings"""
     print("Configuring network...")
-    w.set_mac_address(MAC_ADDR)
-    w.set_ip_address(IP_ADDR)
-    w.set_subnet_mask(SUBNET_MASK)
-    w.set_gateway(GATEWAY)
+    apply_network_config(w)
     time.sleep_ms(100)
     print("Network configured")
 
@@ -66,7 +43,7 @@ def check_configuration(w):
 
 def test_ping(w, target_ip, port=80):
     """Simple ping test using TCP connect"""
-    print(f"\nTesting connection to {target_ip}:{port}...")
+    print(f"\nTesting connection to {ip_str(target_ip)}:{port}...")
     
     try:
         # Open socket
@@ -75,22 +52,22 @@ def test_ping(w, target_ip, port=80):
             print(f"Socket open failed: 0x{status:02x}")
             return False
         
-        # Connect
-        w.socket_connect(0, target_ip, port)
+        # Clear interrupts left over from an earlier attempt on socket 0
+        w._write_reg_u8(0x0002, SOCK_BSB[0], 0xFF)
         
-        # Wait for connection
-        for i in range(30):  # 3 second timeout
-            status = w.socket_status(0)
-            if status == 0x17:  # SOCK_ESTABLISHED
-                print("Connection successful!")
-                w.socket_close(0)
-                return True
-            elif status == 0x00:  # SOCK_CLOSED
-                print("Connection refused/failed")
-                break
-            time.sleep_ms(100)
+        # Connect
+        w.socket_connect(0, ip_bytes(target_ip), port)
         
-        print("Connection timeout")
+        # Wait for connection (3 second timeout)
+        cmd, sir, status = wait_socket_event(w, SOCK_BSB[0], 0x01, 0x08, 3000)
+        if status == 0x17:  # SOCK_ESTABLISHED
+            print("Connection successful!")
+            w.socket_close(0)
+            return True
+        elif status == 0x00:  # SOCK_CLOSED
+            print("Connection refused/failed")
+        else:
+            print("Connection timeout")
         w.socket_close(0)
         return False
         
@@ -125,12 +102,9 @@ def main():
     
     # Wait for PHY link
     print("\nWaiting for PHY link...")
-    for i in range(50):  # 5 second timeout
-        phy = w.get_phy_status()
-        if phy['link']:
-            print("PHY link is UP")
-            break
-        time.sleep_ms(100)
+    phy = wait_for_link(w, 5000)  # 5 second timeout
+    if phy and phy['link']:
+        print("PHY link is UP")
     else:
         print("PHY link timeout - check cable")
         return
@@ -140,12 +114,12 @@ def main():
     print("CONNECTIVITY TESTS")
     print("=" * 40)
     
-    gateway_ok = test_ping(w, GATEWAY, 80)
+    gateway_ok = test_ping(w, GATEWAY_BYTES, 80)
     if not gateway_ok:
-        gateway_ok = test_ping(w, GATEWAY, 53)  # Try DNS port
+        gateway_ok = test_ping(w, GATEWAY_BYTES, 53)  # Try DNS port
     
     # Test Google
-    google_ok = test_ping(w, "8.8.8.8", 53)  # Google DNS
+    google_ok = test_ping(w, GOOGLE_DNS_BYTES, 53)  # Google DNS
     
     # Results
     print("\n" + "=" * 40)
@@ -175,7 +149,7 @@ def test_reconnection():
         configure_network(w)
         
         print("1. Testing initial connection...")
-        initial_ok = test_ping(w, GATEWAY, 80)
+        initial_ok = test_ping(w, GATEWAY_BYTES, 80)
         print(f"   Initial: {'OK' if initial_ok else 'FAIL'}")
         
         print("2. Simulating disconnect (full reset)...")
@@ -184,19 +158,14 @@ def test_reconnection():
         
         # Wait for link
         print("3. Waiting for PHY link recovery...")
-        link_recovered = False
-        for i in range(50):
-            phy = w.get_phy_status()
-            if phy['link']:
-                link_recovered = True
-                break
-            time.sleep_ms(100)
+        phy = wait_for_link(w, 5000)
+        link_recovered = bool(phy and phy['link'])
         
         print(f"   PHY Link: {'RECOVERED' if link_recovered else 'FAILED'}")
         
         if link_recovered:
             print("4. Testing reconnection...")
-            reconnect_ok = test_ping(w, GATEWAY, 80)
+            reconnect_ok = test_ping(w, GATEWAY_BYTES, 80)
             print(f"   Reconnect: {'OK' if reconnect_ok else 'FAIL'}")
             
             if reconnect_ok:
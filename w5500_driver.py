@@ -1,8 +1,10 @@
 #Version = v6
 
 import machine
+import sys
 import time
 import struct
+import micropython
 from micropython import const
 
 # W5500 Block Select Bits (BSB)
@@ -74,10 +76,58 @@ _FDM1 = const(0x01)  # Fixed Data Mode, 1 byte
 _FDM2 = const(0x02)  # Fixed Data Mode, 2 bytes
 _FDM4 = const(0x03)  # Fixed Data Mode, 4 bytes
 
+# Control byte Read/Write bit
+_RWB_WRITE = const(0x04)
+
+# Preallocated SPI scratch size (register accesses up to this many data bytes
+# go out as a single frame / land in the RX scratch without allocating)
+_SCRATCH_LEN = const(64)
+
+# Sn_CR polls before a command is treated as stuck (the chip normally
+# clears Sn_CR within a few microseconds)
+_CMD_POLL_MAX = const(10000)
+
+# RP2040 single-cycle IO block (GPIO_OUT_SET at +0x014, GPIO_OUT_CLR at +0x018)
+_SIO_BASE = const(0xD0000000)
+
+# Lowest SPI clock the constructor falls back to if VERSIONR won't read back
+_SPI_FREQ_MIN = const(1000000)
+
+# Parsed address strings (bounded: cleared when it reaches this many entries)
+_ADDR_CACHE_MAX = const(16)
+_addr_cache = {}
+
+
+def _addr_to_bytes(addr, sep, base):
+    """Parse a dotted IP / colon MAC string to bytes, memoized.
+    Non-string values (bytes, lists) are returned unchanged"""
+    if not isinstance(addr, str):
+        return addr
+    b = _addr_cache.get(addr)
+    if b is None:
+        if len(_addr_cache) >= _ADDR_CACHE_MAX:
+            _addr_cache.clear()
+        b = bytes([int(x, base) for x in addr.split(sep)])
+        _addr_cache[addr] = b
+    return b
+
+
+def _ip_to_bytes(ip):
+    """Convert "192.168.1.2" to 4 bytes (cached)"""
+    return _addr_to_bytes(ip, '.', 10)
+
+
+@micropython.viper
+def _frame_hdr(buf: ptr8, addr: int, ctrl: int):
+    """Fill the 3-byte SPI frame header: Address(2, big-endian) + Control(1)"""
+    buf[0] = addr >> 8
+    buf[1] = addr & 0xFF
+    buf[2] = ctrl
+
 
 class W5500:
     def __init__(self, sck_pin=10, mosi_pin=11, miso_pin=12, cs_pin=13, rst_pin=15, 
-                 spi_freq=10000000):
+                 spi_freq=33000000):
         """
         Initialize W5500 Ethernet controller
         
@@ -87,12 +137,23 @@ class W5500:
             miso_pin: SPI MISO pin (default GP12)
             cs_pin: Chip select pin (default GP13)
             rst_pin: Reset pin (default GP15)
-            spi_freq: SPI frequency in Hz (default 10MHz)
+            spi_freq: SPI frequency in Hz (default 33MHz, halved until
+                VERSIONR reads back correctly; keep SPI wiring short)
         """
         # Initialize GPIO pins
         self.cs = machine.Pin(cs_pin, machine.Pin.OUT)
         self.rst = machine.Pin(rst_pin, machine.Pin.OUT)
         
+        # Chip select toggles: on the RP2040 write the SIO GPIO set/clear
+        # registers directly, elsewhere fall back to the Pin methods
+        if sys.platform == 'rp2':
+            self._cs_mask = 1 << cs_pin
+            self._cs_low = self._sio_cs_low
+            self._cs_high = self._sio_cs_high
+        else:
+            self._cs_low = self.cs.low
+            self._cs_high = self.cs.high
+        
         # Initialize SPI
         self.spi = machine.SPI(1, baudrate=spi_freq, 
                               sck=machine.Pin(sck_pin),
@@ -100,12 +161,42 @@ class W5500:
                               miso=machine.Pin(miso_pin),
                               polarity=0, phase=0)
         
+        # Preallocated SPI frame buffers: header(3) + data. Reads clock the
+        # whole frame full-duplex, so the RX side mirrors the TX layout
+        self._txbuf = bytearray(3 + _SCRATCH_LEN)
+        self._txmv = memoryview(self._txbuf)
+        self._rxbuf = bytearray(3 + _SCRATCH_LEN)
+        self._rxmv = memoryview(self._rxbuf)
+        self._txmv4 = self._txmv[:4]  # Single-byte register frames
+        self._rxmv4 = self._rxmv[:4]
+        
+        # Reusable socket_recv landing buffer (grown on demand)
+        self._recv_buf = bytearray(1024)
+        
+        # Per-socket (register, TX buffer, RX buffer) block select bits
+        self._sock_bsb = tuple((0x01 + n * 4, 0x02 + n * 4, 0x03 + n * 4) for n in range(8))
+        
+        # SPI control byte for every BSB value: BSB[4:0] + RWB + OM[1:0](VDM)
+        self._ctrl_rd = bytes([(b << 3) | _VDM for b in range(32)])
+        self._ctrl_wr = bytes([(b << 3) | _RWB_WRITE | _VDM for b in range(32)])
+        
         # Set initial pin states
         self.cs.value(1)  # CS high (deselected)
         self.rst.value(0) # Reset low
         
         # Hardware reset
         self.reset()
+        
+        # Step the SPI clock down until the chip reads back reliably
+        self.spi_freq = spi_freq
+        while True:
+            version = self.get_version()
+            if version == 0x04:
+                break
+            if self.spi_freq // 2 < _SPI_FREQ_MIN:
+                raise RuntimeError(f"W5500 not responding: VERSIONR 0x{version:02x} at {self.spi_freq} Hz")
+            self.spi_freq //= 2
+            self.spi.init(baudrate=self.spi_freq)
     
     def reset(self):
         """Hardware reset of W5500"""
@@ -138,50 +229,129 @@ class W5500:
         print("WARNING: W5500 may not be responding correctly after reset")
         return False  # Wait for reset to complete
     
+    @micropython.viper
+    def _sio_cs_low(self):
+        ptr32(_SIO_BASE)[6] = int(self._cs_mask)  # SIO GPIO_OUT_CLR
+    
+    @micropython.viper
+    def _sio_cs_high(self):
+        ptr32(_SIO_BASE)[5] = int(self._cs_mask)  # SIO GPIO_OUT_SET
+    
+    @micropython.native
     def _write_reg(self, addr, bsb, data):
         """Write data to W5500 register using Variable Data Mode"""
-        if isinstance(data, int):
-            data = bytes([data])
-        elif isinstance(data, (list, tuple)):
+        if isinstance(data, (list, tuple)):
             data = bytes(data)
             
-        # Create SPI frame: Address(2) + Control(1) + Data(n)
-        addr_bytes = struct.pack('>H', addr)  # 16-bit address, big-endian
-        control = (bsb << 3) | 0x04  # BSB[4:0] + RWB(1) + OM[1:0](00)
+        # Create SPI frame: Address(2) + Control(1) + Data(n) in one buffer
+        frame = self._txbuf
+        _frame_hdr(frame, addr, self._ctrl_wr[bsb])  # BSB[4:0] + RWB(1) + OM[1:0](00)
+        if isinstance(data, int):
+            frame[3] = data
+            n = 4
+        else:
+            n = 3 + len(data)
+            if n <= len(frame):
+                frame[3:n] = data
+        
+        self._cs_low()  # Select chip
+        try:
+            if n <= len(frame):
+                self.spi.write(self._txmv[:n])
+            else:
+                # Too big for the scratch frame: header then data, same CS cycle
+                self.spi.write(self._txmv[:3])
+                self.spi.write(data)
+        finally:
+            self._cs_high()  # Deselect chip
+    
+    @micropython.native
+    def _write_reg_u8(self, addr, bsb, val):
+        """Write a single-byte register (command, mode, ...) as one 4-byte frame"""
+        frame = self._txbuf
+        _frame_hdr(frame, addr, self._ctrl_wr[bsb])
+        frame[3] = val
+        
+        self._cs_low()  # Select chip
+        try:
+            self.spi.write(self._txmv4)
+        finally:
+            self._cs_high()  # Deselect chip
+    
+    @micropython.native
+    def _read_reg_u8(self, addr, bsb):
+        """Read a single-byte register and return it as an int"""
+        _frame_hdr(self._txbuf, addr, self._ctrl_rd[bsb])
         
-        self.cs.value(0)  # Select chip
+        self._cs_low()  # Select chip
         try:
-            self.spi.write(addr_bytes)
-            self.spi.write(bytes([control]))
-            self.spi.write(data)
+            self.spi.write_readinto(self._txmv4, self._rxmv4)
         finally:
-            self.cs.value(1)  # Deselect chip
+            self._cs_high()  # Deselect chip
+        return self._rxbuf[3]
     
+    @micropython.native
     def _read_reg(self, addr, bsb, length=1):
         """Read data from W5500 register using Variable Data Mode"""
-        # Create SPI frame: Address(2) + Control(1) 
-        addr_bytes = struct.pack('>H', addr)  # 16-bit address, big-endian
-        control = (bsb << 3) | 0x00  # BSB[4:0] + RWB(0) + OM[1:0](00)
+        if length > _SCRATCH_LEN:
+            return self._read_reg_view(addr, bsb, length)  # Already a new bytes object
+        return bytes(self._read_reg_view(addr, bsb, length))
+    
+    @micropython.native
+    def _read_reg_view(self, addr, bsb, length):
+        """Zero-copy variant of _read_reg for hot paths.
         
-        self.cs.value(0)  # Select chip
+        Reads of up to _SCRATCH_LEN bytes return a memoryview into a scratch
+        buffer that the next read reuses, so only use it where the result is
+        unpacked or copied before the next register access.
+        """
+        # Create SPI frame: Address(2) + Control(1) + dummy bytes(n); the
+        # W5500 ignores MOSI during the data phase
+        _frame_hdr(self._txbuf, addr, self._ctrl_rd[bsb])  # BSB[4:0] + RWB(0) + OM[1:0](00)
+        
+        self._cs_low()  # Select chip
         try:
-            self.spi.write(addr_bytes)
-            self.spi.write(bytes([control]))
-            data = self.spi.read(length)
+            if length <= _SCRATCH_LEN:
+                # Header and data phase in one full-duplex transfer
+                n = 3 + length
+                self.spi.write_readinto(self._txmv[:n], self._rxmv[:n])
+                data = self._rxmv[3:n]
+            else:
+                self.spi.write(self._txmv[:3])
+                data = self.spi.read(length)
         finally:
-            self.cs.value(1)  # Deselect chip
+            self._cs_high()  # Deselect chip
             
         return data
     
+    @micropython.native
+    def _read_reg_into(self, addr, bsb, buf):
+        """Read len(buf) bytes from W5500 registers/buffer memory into buf"""
+        _frame_hdr(self._txbuf, addr, self._ctrl_rd[bsb])  # BSB[4:0] + RWB(0) + OM[1:0](00)
+        
+        self._cs_low()  # Select chip
+        try:
+            self.spi.write(self._txmv[:3])
+            self.spi.readinto(buf)
+        finally:
+            self._cs_high()  # Deselect chip
+    
+    @micropython.native
+    def _wait_cmd(self, socket_bsb):
+        """Spin until the W5500 accepts the last Sn_CR command (Sn_CR reads 0)"""
+        for _ in range(_CMD_POLL_MAX):
+            if not self._read_reg_u8(_Sn_CR, socket_bsb):
+                return
+        raise RuntimeError("Socket command timeout")
+    
     def get_version(self):
         """Get W5500 chip version (should return 0x04)"""
-        return self._read_reg(_VERSIONR, _BSB_COMMON_REG, 1)[0]
+        return self._read_reg_u8(_VERSIONR, _BSB_COMMON_REG)
     
     def set_mac_address(self, mac):
         """Set MAC address (6 bytes)"""
-        if isinstance(mac, str):
-            # Convert string format "00:11:22:33:44:55" to bytes
-            mac = bytes([int(x, 16) for x in mac.split(':')])
+        # Convert string format "00:11:22:33:44:55" to bytes
+        mac = _addr_to_bytes(mac, ':', 16)
         self._write_reg(_SHAR, _BSB_COMMON_REG, mac)
     
     def get_mac_address(self):
@@ -191,8 +361,7 @@ class W5500:
     
     def set_ip_address(self, ip):
         """Set IP address"""
-        if isinstance(ip, str):
-            ip = bytes([int(x) for x in ip.split('.')])
+        ip = _ip_to_bytes(ip)
         self._write_reg(_SIPR, _BSB_COMMON_REG, ip)
     
     def get_ip_address(self):
@@ -202,19 +371,23 @@ class W5500:
     
     def set_subnet_mask(self, mask):
         """Set subnet mask"""
-        if isinstance(mask, str):
-            mask = bytes([int(x) for x in mask.split('.')])
+        mask = _ip_to_bytes(mask)
         self._write_reg(_SUBR, _BSB_COMMON_REG, mask)
     
     def set_gateway(self, gateway):
         """Set gateway address"""
-        if isinstance(gateway, str):
-            gateway = bytes([int(x) for x in gateway.split('.')])
+        gateway = _ip_to_bytes(gateway)
         self._write_reg(_GAR, _BSB_COMMON_REG, gateway)
     
+    def set_gateway_and_mask(self, gateway, mask):
+        """Set gateway address and subnet mask in one burst (GAR..SUBR)"""
+        gateway = _ip_to_bytes(gateway)
+        mask = _ip_to_bytes(mask)
+        self._write_reg(_GAR, _BSB_COMMON_REG, bytes(gateway) + bytes(mask))
+    
     def get_phy_status(self):
         """Get PHY configuration and status"""
-        phycfgr = self._read_reg(_PHYCFGR, _BSB_COMMON_REG, 1)[0]
+        phycfgr = self._read_reg_u8(_PHYCFGR, _BSB_COMMON_REG)
         return {
             'link': bool(phycfgr & 0x01),
             'speed_100m': bool(phycfgr & 0x02),
@@ -224,129 +397,158 @@ class W5500:
     
     def socket_open(self, socket_num, mode, port):
         """Open a socket"""
-        if socket_num > 7:
+        if not 0 <= socket_num <= 7:
             raise ValueError("Socket number must be 0-7")
-            
-        # Calculate socket register BSB
-        socket_bsb = 0x01 + (socket_num * 4)
         
-        # Set socket mode
-        self._write_reg(_Sn_MR, socket_bsb, mode)
+        # Look up socket register BSB
+        socket_bsb = self._sock_bsb[socket_num][0]
         
-        # Set source port
-        self._write_reg(_Sn_PORT, socket_bsb, struct.pack('>H', port))
+        # Set socket mode and source port in one burst over Sn_MR..Sn_PORT:
+        # CR=0 is no command, IR=0 clears nothing and SR is read-only
+        self._write_reg(_Sn_MR, socket_bsb, struct.pack('>BBBBH', mode, 0, 0, 0, port))
         
         # Open socket
-        self._write_reg(_Sn_CR, socket_bsb, _CMD_OPEN)
+        self._write_reg_u8(_Sn_CR, socket_bsb, _CMD_OPEN)
         
         # Wait for command to complete
-        while self._read_reg(_Sn_CR, socket_bsb, 1)[0] != 0:
-            time.sleep_ms(1)
+        self._wait_cmd(socket_bsb)
         
         # Check if socket opened successfully
-        status = self._read_reg(_Sn_SR, socket_bsb, 1)[0]
+        status = self._read_reg_u8(_Sn_SR, socket_bsb)
         return status
     
     def socket_close(self, socket_num):
         """Close a socket"""
-        socket_bsb = 0x01 + (socket_num * 4)
-        self._write_reg(_Sn_CR, socket_bsb, _CMD_CLOSE)
+        socket_bsb = self._sock_bsb[socket_num][0]
+        self._write_reg_u8(_Sn_CR, socket_bsb, _CMD_CLOSE)
         
         # Wait for command to complete
-        while self._read_reg(_Sn_CR, socket_bsb, 1)[0] != 0:
-            time.sleep_ms(1)
+        self._wait_cmd(socket_bsb)
     
+    @micropython.native
     def socket_status(self, socket_num):
         """Get socket status"""
-        socket_bsb = 0x01 + (socket_num * 4)
-        return self._read_reg(_Sn_SR, socket_bsb, 1)[0]
+        socket_bsb = self._sock_bsb[socket_num][0]
+        return self._read_reg_u8(_Sn_SR, socket_bsb)
     
     def socket_connect(self, socket_num, dest_ip, dest_port):
         """Connect socket to destination (TCP)"""
-        socket_bsb = 0x01 + (socket_num * 4)
+        socket_bsb = self._sock_bsb[socket_num][0]
         
-        # Set destination IP
-        if isinstance(dest_ip, str):
-            dest_ip = bytes([int(x) for x in dest_ip.split('.')])
-        self._write_reg(_Sn_DIPR, socket_bsb, dest_ip)
-        
-        # Set destination port
-        self._write_reg(_Sn_DPORT, socket_bsb, struct.pack('>H', dest_port))
+        # Set destination IP and port (Sn_DIPR..Sn_DPORT are contiguous)
+        dest_ip = _ip_to_bytes(dest_ip)
+        self._write_reg(_Sn_DIPR, socket_bsb, bytes(dest_ip) + struct.pack('>H', dest_port))
         
         # Connect
-        self._write_reg(_Sn_CR, socket_bsb, _CMD_CONNECT)
+        self._write_reg_u8(_Sn_CR, socket_bsb, _CMD_CONNECT)
         
         # Wait for command to complete
-        while self._read_reg(_Sn_CR, socket_bsb, 1)[0] != 0:
-            time.sleep_ms(1)
+        self._wait_cmd(socket_bsb)
     
+    @micropython.native
     def socket_send(self, socket_num, data):
         """Send data through socket"""
         if isinstance(data, str):
             data = data.encode('utf-8')
+        elif isinstance(data, (list, tuple)):
+            data = bytes(data)
             
-        socket_bsb = 0x01 + (socket_num * 4)
-        tx_buf_bsb = 0x02 + (socket_num * 4)
-        
-        # Get current TX write pointer
-        tx_wr_bytes = self._read_reg(_Sn_TX_WR, socket_bsb, 2)
-        tx_wr = struct.unpack('>H', tx_wr_bytes)[0]
-        
-        # Write data to TX buffer
-        for i, byte in enumerate(data):
-            addr = (tx_wr + i) & 0xFFFF
-            self._write_reg(addr, tx_buf_bsb, byte)
+        socket_bsb, tx_buf_bsb, _ = self._sock_bsb[socket_num]
+        
+        # Get TX free size and write pointer in one burst (Sn_TX_FSR..Sn_TX_WR)
+        tx_fsr, _, tx_wr = struct.unpack('>HHH', self._read_reg_view(_Sn_TX_FSR, socket_bsb, 6))
+        if len(data) > tx_fsr:
+            raise RuntimeError(f"TX buffer full: {len(data)} bytes, {tx_fsr} free")
+        
+        # Write data to TX buffer in one burst (two if it crosses the
+        # 16-bit pointer wrap)
+        first = 0x10000 - tx_wr
+        if len(data) > first:
+            mv = memoryview(data)
+            self._write_reg(tx_wr, tx_buf_bsb, mv[:first])
+            self._write_reg(0x0000, tx_buf_bsb, mv[first:])
+        else:
+            self._write_reg(tx_wr, tx_buf_bsb, data)
         
         # Update TX write pointer
         new_tx_wr = (tx_wr + len(data)) & 0xFFFF
         self._write_reg(_Sn_TX_WR, socket_bsb, struct.pack('>H', new_tx_wr))
         
         # Send command
-        self._write_reg(_Sn_CR, socket_bsb, _CMD_SEND)
+        self._write_reg_u8(_Sn_CR, socket_bsb, _CMD_SEND)
         
         # Wait for command to complete
-        while self._read_reg(_Sn_CR, socket_bsb, 1)[0] != 0:
-            time.sleep_ms(1)
+        self._wait_cmd(socket_bsb)
+    
+    @micropython.native
+    def _wait_readable(self, socket_bsb, timeout_ms=0):
+        """Wait up to timeout_ms for received data. Sn_RX_RSR is read together
+        with Sn_RX_RD and only accepted once two consecutive reads agree, so a
+        size caught while the chip is updating it is never used.
+        Returns (rx_rsr, rx_rd); rx_rsr is 0 on timeout"""
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        prev = -1
+        while True:
+            rx_rsr, rx_rd = struct.unpack('>HH', self._read_reg_view(_Sn_RX_RSR, socket_bsb, 4))
+            if rx_rsr == prev:
+                if rx_rsr or time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                    return rx_rsr, rx_rd
+                time.sleep_ms(1)
+            prev = rx_rsr
+    
+    def socket_available(self, socket_num, timeout_ms=0):
+        """Bytes waiting in the socket RX buffer, waiting up to timeout_ms
+        for some to arrive"""
+        return self._wait_readable(self._sock_bsb[socket_num][0], timeout_ms)[0]
     
+    @micropython.native
     def socket_recv(self, socket_num, max_length=1024):
         """Receive data from socket"""
-        socket_bsb = 0x01 + (socket_num * 4)
-        rx_buf_bsb = 0x03 + (socket_num * 4)
+        # Land the data in the reusable receive buffer, then copy out
+        # exactly what arrived
+        if len(self._recv_buf) < max_length:
+            self._recv_buf = bytearray(max_length)
+        n = self.socket_recv_into(socket_num, memoryview(self._recv_buf)[:max_length])
+        if n == 0:
+            return b''
+        return bytes(self._recv_buf[:n])
+    
+    @micropython.native
+    def socket_recv_into(self, socket_num, buf):
+        """Receive up to len(buf) bytes from socket into buf.
+        Returns the number of bytes received (0 if none pending)"""
+        socket_bsb, _, rx_buf_bsb = self._sock_bsb[socket_num]
         
-        # Check received data size
-        rx_rsr_bytes = self._read_reg(_Sn_RX_RSR, socket_bsb, 2)
-        rx_rsr = struct.unpack('>H', rx_rsr_bytes)[0]
+        # Check received data size (and current RX read pointer)
+        rx_rsr, rx_rd = self._wait_readable(socket_bsb)
         
         if rx_rsr == 0:
-            return b''
-        
-        # Limit to max_length
-        read_size = min(rx_rsr, max_length)
+            return 0
         
-        # Get current RX read pointer
-        rx_rd_bytes = self._read_reg(_Sn_RX_RD, socket_bsb, 2)
-        rx_rd = struct.unpack('>H', rx_rd_bytes)[0]
+        # Limit to buffer size
+        read_size = min(rx_rsr, len(buf))
         
-        # Read data from RX buffer
-        data = bytearray()
-        for i in range(read_size):
-            addr = (rx_rd + i) & 0xFFFF
-            byte = self._read_reg(addr, rx_buf_bsb, 1)[0]
-            data.append(byte)
+        # Read data from RX buffer straight into buf in one burst (two if it
+        # crosses the 16-bit pointer wrap)
+        mv = memoryview(buf)
+        first = 0x10000 - rx_rd
+        if read_size > first:
+            self._read_reg_into(rx_rd, rx_buf_bsb, mv[:first])
+            self._read_reg_into(0x0000, rx_buf_bsb, mv[first:read_size])
+        else:
+            self._read_reg_into(rx_rd, rx_buf_bsb, mv[:read_size])
         
         # Update RX read pointer
         new_rx_rd = (rx_rd + read_size) & 0xFFFF
         self._write_reg(_Sn_RX_RD, socket_bsb, struct.pack('>H', new_rx_rd))
         
         # RECV command to update pointers
-        self._write_reg(_Sn_CR, socket_bsb, _CMD_RECV)
+        self._write_reg_u8(_Sn_CR, socket_bsb, _CMD_RECV)
         
         # Wait for command to complete
-        while self._read_reg(_Sn_CR, socket_bsb, 1)[0] != 0:
-            time.sleep_ms(1)
+        self._wait_cmd(socket_bsb)
         
-        return bytes(data)
-
+        return read_size
 
 class W5500ModbusTCP:
     """Simple Modbus TCP client using W5500"""
@@ -355,6 +557,7 @@ class W5500ModbusTCP:
         self.w5500 = w5500
         self.socket = 0
         self.connected = False
+        self._req_buf = bytearray(12)  # MBAP(7) + PDU(5) request frame
     
     def connect(self, server_ip, server_port=502):
         """Connect to Modbus TCP server"""
@@ -367,7 +570,7 @@ class W5500ModbusTCP:
         self.w5500.socket_connect(self.socket, server_ip, server_port)
         
         # Wait for connection
-        timeout = 50  # 5 second timeout
+        timeout = 5000  # 5 second timeout
         while timeout > 0:
             status = self.w5500.socket_status(self.socket)
             if status == _SOCK_ESTABLISHED:
@@ -375,7 +578,7 @@ class W5500ModbusTCP:
                 return True
             elif status == _SOCK_CLOSED:
                 raise RuntimeError("Connection failed")
-            time.sleep_ms(100)
+            time.sleep_ms(1)
             timeout -= 1
         
         raise RuntimeError("Connection timeout")
@@ -386,6 +589,7 @@ class W5500ModbusTCP:
             self.w5500.socket_close(self.socket)
             self.connected = False
     
+    @micropython.native
     def read_holding_registers(self, slave_id, start_addr, count):
         """Read holding registers (function code 3)"""
         if not self.connected:
@@ -396,35 +600,27 @@ class W5500ModbusTCP:
         protocol_id = 0
         length = 6
         
-        # MBAP Header
-        mbap = struct.pack('>HHHB', transaction_id, protocol_id, length, slave_id)
-        
-        # PDU
-        pdu = struct.pack('>BHH', 3, start_addr, count)  # Function 3, start, count
+        # MBAP Header + PDU (function 3, start, count) packed in one call
+        struct.pack_into('>HHHBBHH', self._req_buf, 0,
+                         transaction_id, protocol_id, length, slave_id,
+                         3, start_addr, count)
         
         # Send request
-        frame = mbap + pdu
-        self.w5500.socket_send(self.socket, frame)
+        self.w5500.socket_send(self.socket, self._req_buf)
         
         # Wait for response
-        timeout = 50  # 5 second timeout
-        while timeout > 0:
-            response = self.w5500.socket_recv(self.socket, 256)
-            if len(response) > 0:
-                # Parse response
-                if len(response) >= 9:  # Minimum response length
-                    resp_trans_id, resp_proto_id, resp_length, resp_slave_id, resp_func = struct.unpack('>HHHBB', response[:8])
-                    if resp_func == 3:  # Read holding registers response
-                        byte_count = response[8]
-                        if len(response) >= 9 + byte_count:
-                            data = response[9:9+byte_count]
-                            # Convert to 16-bit registers
-                            registers = []
-                            for i in range(0, len(data), 2):
-                                registers.append(struct.unpack('>H', data[i:i+2])[0])
-                            return registers
-                return None
-            time.sleep_ms(100)
-            timeout -= 1
-        
-        raise RuntimeError("Read timeout")
\ No newline at end of file
+        if not self.w5500.socket_available(self.socket, 5000):  # 5 second timeout
+            raise RuntimeError("Read timeout")
+        
+        response = self.w5500.socket_recv(self.socket, 256)
+        
+        # Parse response
+        if len(response) >= 9:  # Minimum response length
+            resp_trans_id, resp_proto_id, resp_length, resp_slave_id, resp_func = struct.unpack('>HHHBB', response[:8])
+            if resp_func == 3:  # Read holding registers response
+                byte_count = response[8]
+                if len(response) >= 9 + byte_count:
+                    # Convert to 16-bit registers in one unpack
+                    n = byte_count // 2
+                    return list(struct.unpack_from('>%dH' % n, response, 9))
+        return None